@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Per-domain 70-30 splits, cached as Parquet so repeated runs skip CSV parsing and re-splitting
+"""
+
+import json
+import os
+from collections import Counter
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = 'data/.split_cache'
+
+# Columns the training and validation scripts consume; commit_sha etc. are never parsed
+_USECOLS = {'refactoring_type', 'class_name', 'method_name', 'lines_changed', 'cyclomatic_complexity',
+            'nesting_depth', 'file_path', 'class_encoded', 'method_encoded'}
+_DTYPES = {'lines_changed': 'int32', 'cyclomatic_complexity': 'int16', 'nesting_depth': 'int8',
+           'class_encoded': 'int32', 'method_encoded': 'int32'}
+
+# Model inputs, in the column order the classifiers are trained on
+FEATURE_COLS = ['class_encoded', 'method_encoded', 'lines_changed', 'cyclomatic_complexity', 'nesting_depth']
+
+def feature_matrix(df):
+    """Float32 feature matrix with NaNs zeroed, for fit and predict"""
+    # RandomForest converts its input to float32; building it that way avoids a second copy
+    return np.nan_to_num(df[FEATURE_COLS].to_numpy(dtype=np.float32), copy=False)
+
+def prediction_tally(y_pred, top=3):
+    """Number of distinct predicted labels and the top most frequent ones as a dict"""
+    # One counting pass; most_common keeps first-seen order on ties, like value_counts
+    counts = Counter(y_pred)
+    return len(counts), dict(counts.most_common(top))
+
+def _load_domain(csv_path):
+    """Read a domain CSV and make sure the encoded identifier columns exist as int32"""
+    # The pyarrow reader is multi-threaded but only takes an explicit column list,
+    # and the encoded columns exist in some domain CSVs only
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = [col for col in header if col in _USECOLS]
+    df = pd.read_csv(csv_path, usecols=usecols, dtype=_DTYPES, engine='pyarrow')
+    
+    # Apache Commons/Gson ships without encoded columns; category codes keep it on the
+    # same small-integer scale as the stored codes of the other domains, and exact in float32
+    for source_col, encoded_col in (('class_name', 'class_encoded'), ('method_name', 'method_encoded')):
+        if encoded_col not in df.columns:
+            df[encoded_col] = pd.Categorical(df[source_col].fillna('')).codes
+        df[encoded_col] = df[encoded_col].astype('int32')
+    
+    return df
+
+def _drop_rare(df, col='refactoring_type', min_count=2):
+    """Drop rows whose class occurs fewer than min_count times"""
+    # transform('size') gives a row-aligned count, so no sorted value_counts/isin round trip
+    return df[df.groupby(col)[col].transform('size') >= min_count]
+
+def _split_domain(csv_path, test_size, random_state):
+    """Filter rare classes and create the stratified split"""
+    # sklearn takes about a second to import and is only needed when the cache is stale
+    from sklearn.model_selection import train_test_split
+    
+    df = _load_domain(csv_path)
+    
+    # Filter rare classes for stratification
+    df_filtered = _drop_rare(df)
+    
+    return train_test_split(
+        df_filtered,
+        test_size=test_size,
+        random_state=random_state,
+        stratify=df_filtered['refactoring_type']
+    )
+
+def cached_split(csv_path, test_size=0.3, random_state=42, columns=None):
+    """Return (train_df, test_df) for a domain CSV, rebuilding the Parquet cache when stale"""
+    cache_base = os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(csv_path))[0])
+    meta_path = f"{cache_base}.meta.json"
+    
+    # The cache is keyed by the CSV modification time and the split parameters
+    meta = {
+        'csv_mtime': os.path.getmtime(csv_path),
+        'test_size': test_size,
+        'random_state': random_state,
+        'identifier_encoding': 'categorical'
+    }
+    
+    try:
+        with open(meta_path, 'r') as f:
+            cached_meta = json.load(f)
+    except (OSError, ValueError):
+        cached_meta = None
+    
+    if cached_meta != meta:
+        train_df, test_df = _split_domain(csv_path, test_size, random_state)
+        
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        train_df.to_parquet(f"{cache_base}.train.parquet", engine='pyarrow', compression='zstd')
+        test_df.to_parquet(f"{cache_base}.test.parquet", engine='pyarrow', compression='zstd')
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+    
+    train_df = pd.read_parquet(f"{cache_base}.train.parquet", engine='pyarrow', columns=columns)
+    test_df = pd.read_parquet(f"{cache_base}.test.parquet", engine='pyarrow', columns=columns)
+    
+    return train_df, test_df
+
+@lru_cache(maxsize=None)
+def get_split(csv_path, test_size=0.3, random_state=42, columns=None):
+    """Memoized cached_split shared by the training and validation scripts; callers must copy before mutating"""
+    # columns is a tuple here so the call stays hashable for the memo
+    return cached_split(csv_path, test_size=test_size, random_state=random_state,
+                        columns=list(columns) if columns is not None else None)
@@ -4,14 +4,31 @@ Analyze test suites in our projects to identify candidates for behavioral valida
 """
 
 import os
+import stat
 import subprocess
 import glob
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+# Project test commands run at the same time
+TEST_RUN_WORKERS = 2
+
+def iter_java_files(root):
+    """Yield every .java file under root using scandir's cached entry types"""
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from iter_java_files(entry.path)
+            elif entry.name.endswith('.java'):
+                yield entry.path
 
 def analyze_project_tests(project_path, project_name):
     """Analyze test coverage and structure for a project"""
     
-    if not os.path.exists(project_path):
+    # A single stat serves both the existence and the directory check
+    try:
+        project_stat = os.stat(project_path)
+    except OSError:
         print(f"❌ {project_name}: Project not found at {project_path}")
         return None
     
@@ -19,7 +36,7 @@ def analyze_project_tests(project_path, project_name):
     print(f"Path: {project_path}")
     
     # Check if it's a valid project directory
-    if not os.path.isdir(project_path):
+    if not stat.S_ISDIR(project_stat.st_mode):
         print(f"❌ Not a directory")
         return None
     
@@ -64,10 +81,12 @@ def analyze_project_tests(project_path, project_name):
         print(f"   ... and {len(test_dirs) - 3} more")
     
     # Count test files
+    # Nested matches (src/test and src/test/java) are walked once, via their outermost dir
     total_test_files = 0
     for test_dir in test_dirs:
-        java_tests = glob.glob(os.path.join(test_dir, '**/*.java'), recursive=True)
-        total_test_files += len(java_tests)
+        if any(test_dir.startswith(other + os.sep) for other in test_dirs):
+            continue
+        total_test_files += sum(1 for _ in iter_java_files(test_dir))
     
     print(f"✅ Total test files: {total_test_files}")
     
@@ -78,80 +97,54 @@ def analyze_project_tests(project_path, project_name):
     elif any('gradle' in f for f in build_files):
         test_command = './gradlew test --quiet'
     
-    if test_command:
-        print(f"🧪 Testing build system with: {test_command}")
-        try:
-            # Change to project directory and run test command
-            result = subprocess.run(
-                test_command.split(),
-                cwd=project_path,
-                capture_output=True,
-                text=True,
-                timeout=60  # 1 minute timeout
-            )
-            
-            if result.returncode == 0:
-                print(f"✅ Tests can be executed successfully")
-                return {
-                    'name': project_name,
-                    'path': project_path,
-                    'build_files': build_files,
-                    'test_dirs': test_dirs,
-                    'test_files': total_test_files,
-                    'test_command': test_command,
-                    'tests_runnable': True
-                }
-            else:
-                print(f"⚠️  Tests exist but may have issues:")
-                print(f"   Return code: {result.returncode}")
-                if result.stderr:
-                    print(f"   Error: {result.stderr[:200]}...")
-                return {
-                    'name': project_name,
-                    'path': project_path,
-                    'build_files': build_files,
-                    'test_dirs': test_dirs,
-                    'test_files': total_test_files,
-                    'test_command': test_command,
-                    'tests_runnable': False,
-                    'error': result.stderr[:200]
-                }
-        
-        except subprocess.TimeoutExpired:
-            print(f"⚠️  Test execution timed out (>60s)")
-            return {
-                'name': project_name,
-                'path': project_path,
-                'build_files': build_files,
-                'test_dirs': test_dirs,
-                'test_files': total_test_files,
-                'test_command': test_command,
-                'tests_runnable': False,
-                'error': 'Timeout'
-            }
-        except Exception as e:
-            print(f"⚠️  Error running tests: {e}")
-            return {
-                'name': project_name,
-                'path': project_path,
-                'build_files': build_files,
-                'test_dirs': test_dirs,
-                'test_files': total_test_files,
-                'test_command': test_command,
-                'tests_runnable': False,
-                'error': str(e)
-            }
-    
+    # The test command itself is run by main(), concurrently across projects
     return {
         'name': project_name,
         'path': project_path,
         'build_files': build_files,
         'test_dirs': test_dirs,
         'test_files': total_test_files,
-        'test_command': None,
+        'test_command': test_command,
         'tests_runnable': False
     }
 
+def run_project_tests(project):
+    """Run a project's test command (quick check) and record whether it works"""
+    try:
+        # Change to project directory and run test command
+        result = subprocess.run(
+            project['test_command'].split(),
+            cwd=project['path'],
+            capture_output=True,
+            text=True,
+            timeout=60  # 1 minute timeout
+        )
+    except subprocess.TimeoutExpired:
+        return {**project, 'error': 'Timeout'}
+    except Exception as e:
+        return {**project, 'error': str(e)}
+    
+    if result.returncode == 0:
+        return {**project, 'tests_runnable': True}
+    
+    return {**project, 'return_code': result.returncode, 'error': result.stderr[:200]}
+
+def report_test_run(project):
+    """Print the outcome of a project's test command"""
+    print(f"\n🧪 {project['name']}: tested build system with: {project['test_command']}")
+    
+    if project['tests_runnable']:
+        print(f"✅ Tests can be executed successfully")
+    elif project.get('error') == 'Timeout':
+        print(f"⚠️  Test execution timed out (>60s)")
+    elif 'return_code' in project:
+        print(f"⚠️  Tests exist but may have issues:")
+        print(f"   Return code: {project['return_code']}")
+        if project['error']:
+            print(f"   Error: {project['error']}...")
+    else:
+        print(f"⚠️  Error running tests: {project['error']}")
+
 def main():
     """Analyze all available projects for behavioral validation suitability"""
     
@@ -174,6 +167,18 @@ def main():
         if result and result.get('test_files', 0) > 0:
             suitable_projects.append(result)
     
+    # At most two builds overlap: each run has a 60s timeout, and full Maven/Gradle test
+    # commands competing for CPU and disk would time out and read as "not runnable"
+    testable = [p for p in suitable_projects if p['test_command']]
+    if testable:
+        with ThreadPoolExecutor(max_workers=min(TEST_RUN_WORKERS, len(testable))) as executor:
+            tested = dict(zip((p['name'] for p in testable), executor.map(run_project_tests, testable)))
+        
+        suitable_projects = [tested.get(p['name'], p) for p in suitable_projects]
+        for project in suitable_projects:
+            if project['test_command']:
+                report_test_run(project)
+    
     # Summary
     print(f"\n📊 SUMMARY")
     print("=" * 60)
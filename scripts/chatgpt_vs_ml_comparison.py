@@ -5,13 +5,19 @@ Using fresh ChatGPT suggestions vs our mixed-domain ML model
 """
 
 import os
-import pandas as pd
-import joblib
-import subprocess
-import shutil
+import csv
+import logging
+import glob
 import re
-from sklearn.model_selection import train_test_split
-from proper_java_refactoring import backup_project, restore_project
+from proper_java_refactoring import backup_project, restore_project, snapshot_project, fast_copytree, discard_tree, write_java_file
+# Gradle runs and model predictions are shared with the behavioral validation script
+from proper_behavioral_validation import warm_gradle_daemon, run_test_suite, predict_mockito_test_split
+
+# Every key a comparison record can carry, in CSV column order
+COMPARISON_FIELDS = [
+    'file_path', 'ml_prediction', 'chatgpt_suggestion', 'chatgpt_details', 'chatgpt_reasoning',
+    'chatgpt_applied', 'chatgpt_safe', 'approaches_agree', 'baseline_passed', 'post_chatgpt_passed', 'error'
+]
 
 def get_chatgpt_suggestions():
     """Fresh ChatGPT suggestions from new conversation"""
@@ -135,8 +141,7 @@ def apply_chatgpt_suggestion(project_dir, file_path, suggestion):
                 
                 updated_content = '\n'.join(lines)
                 
-                with open(full_file_path, 'w', encoding='utf-8') as f:
-                    f.write(updated_content)
+                write_java_file(full_file_path, updated_content)
                 
                 return True, {
                     'type': 'Extract Variable (ChatGPT)',
@@ -161,8 +166,7 @@ def apply_chatgpt_suggestion(project_dir, file_path, suggestion):
             updated_content = re.sub(method_pattern, add_annotation, content)
             
             if updated_content != content:
-                with open(full_file_path, 'w', encoding='utf-8') as f:
-                    f.write(updated_content)
+                write_java_file(full_file_path, updated_content)
                 
                 return True, {
                     'type': 'Add Method Annotation (ChatGPT)',
@@ -184,8 +188,7 @@ def apply_chatgpt_suggestion(project_dir, file_path, suggestion):
             updated_content = re.sub(method_pattern, replacement, content)
             
             if updated_content != content:
-                with open(full_file_path, 'w', encoding='utf-8') as f:
-                    f.write(updated_content)
+                write_java_file(full_file_path, updated_content)
                 
                 return True, {
                     'type': 'Change Return Type (ChatGPT)',
@@ -217,32 +220,9 @@ def apply_chatgpt_suggestion(project_dir, file_path, suggestion):
     return False, "No changes made"
 
 def get_correct_predictions():
-    """Get the same 8 correct predictions we tested before"""
-    
-    mockito_df = pd.read_csv('data/mockito_enhanced_dataset.csv')
-    
-    class_counts = mockito_df['refactoring_type'].value_counts()
-    valid_classes = class_counts[class_counts >= 2].index
-    df_filtered = mockito_df[mockito_df['refactoring_type'].isin(valid_classes)]
-    
-    train_df, test_df = train_test_split(
-        df_filtered, 
-        test_size=0.3, 
-        random_state=42, 
-        stratify=df_filtered['refactoring_type']
-    )
-    
-    model = joblib.load('models/complete_mixed_domain_classifier.pkl')
-    
-    feature_cols = ['class_encoded', 'method_encoded', 'lines_changed', 'cyclomatic_complexity', 'nesting_depth']
-    X_test = test_df[feature_cols].fillna(0)
-    predictions = model.predict(X_test)
-    
-    test_df = test_df.copy()
-    test_df['predicted_refactoring'] = predictions
-    
-    correct_predictions = test_df[test_df['refactoring_type'] == test_df['predicted_refactoring']]
-    
+    """Get the model's correct predictions on the Mockito test split"""
+    # Shares the validation script's memoized predictions instead of re-running the model
+    _, correct_predictions = predict_mockito_test_split()
     return correct_predictions
 
 def setup_comparison_workspace():
@@ -250,8 +230,12 @@ def setup_comparison_workspace():
     
     workspace_dir = 'behavioral_validation/chatgpt_vs_ml_workspace'
     
+    # The old workspace is deleted in the background while the new one is copied;
+    # leftovers from an interrupted run are swept up the same way
+    for stale_dir in glob.glob(f"{workspace_dir}.todelete.*"):
+        discard_tree(stale_dir)
     if os.path.exists(workspace_dir):
-        shutil.rmtree(workspace_dir)
+        discard_tree(workspace_dir)
     
     os.makedirs(workspace_dir, exist_ok=True)
     
@@ -263,39 +247,19 @@ def setup_comparison_workspace():
         return None
     
     print(f"📁 Setting up ChatGPT vs ML comparison workspace...")
-    shutil.copytree(source_dir, target_dir)
-    
-    return target_dir
-
-def run_test_suite(project_dir, test_name="baseline"):
-    """Run Mockito test suite"""
+    fast_copytree(source_dir, target_dir)
     
-    print(f"🧪 Running {test_name} tests...")
+    # One hardlink snapshot of the pristine tree replaces a full copy per backup
+    snapshot_project(target_dir)
     
-    try:
-        result = subprocess.run(
-            ['./gradlew', 'mockito-core:test', '--quiet', '--continue'],
-            cwd=project_dir,
-            capture_output=True,
-            text=True,
-            timeout=300
-        )
-        
-        return {
-            'success': result.returncode == 0,
-            'return_code': result.returncode,
-            'stdout': result.stdout,
-            'stderr': result.stderr
-        }
-        
-    except subprocess.TimeoutExpired:
-        return {'success': False, 'error': 'timeout'}
-    except Exception as e:
-        return {'success': False, 'error': str(e)}
+    return target_dir
 
 def main():
     """Execute ChatGPT vs ML comparison"""
     
+    # The shared Gradle helpers report through logging
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s %(message)s')
+    
     print("🎯 CHATGPT vs ML REFACTORING COMPARISON")
     print("Comparing Fresh ChatGPT suggestions with Mixed-Domain ML model")
     print("=" * 70)
@@ -312,6 +276,9 @@ def main():
     if project_dir is None:
         return
     
+    # Later runs reuse the warm daemon instead of paying JVM start and configuration
+    warm_gradle_daemon(project_dir)
+    
     # Run baseline tests
     print(f"\n📊 Establishing baseline...")
     baseline_results = run_test_suite(project_dir, "baseline")
@@ -323,116 +290,133 @@ def main():
     print(f"✅ Baseline established")
     
     # Map predictions to ChatGPT suggestions
-    comparison_results = []
     modulehandler_count = 0
+    total_comparisons = 0
+    chatgpt_applied_count = 0
+    chatgpt_safe_count = 0
+    agreement_count = 0
+    comparison_details = []
     
     print(f"\n🔬 Comparing Fresh ChatGPT vs ML on each code location...")
     
-    for idx, (_, prediction_row) in enumerate(correct_predictions.iterrows()):
-        
-        print(f"\n--- Comparison {idx + 1}/{len(correct_predictions)} ---")
-        
-        file_path = prediction_row['file_path']
-        ml_prediction = prediction_row['refactoring_type']
-        
-        # Handle multiple ModuleHandler cases
-        chatgpt_key = file_path
-        if 'ModuleHandler.java' in file_path:
-            modulehandler_count += 1
-            if modulehandler_count == 1:
-                chatgpt_key = file_path  # Change Return Type case
-            elif modulehandler_count == 2:
-                chatgpt_key = file_path + '_extract'  # Extract Method case
-            elif modulehandler_count == 3:
-                chatgpt_key = file_path + '_rename'  # Rename Method case
-        
-        if chatgpt_key not in chatgpt_suggestions:
-            print(f"⏭️  Skipping - no ChatGPT suggestion for {file_path}")
-            continue
-        
-        chatgpt_suggestion = chatgpt_suggestions[chatgpt_key]
-        
-        print(f"File: {file_path}")
-        print(f"ML Prediction: {ml_prediction}")
-        print(f"ChatGPT Suggestion: {chatgpt_suggestion['refactoring_type']}")
-        print(f"ChatGPT Details: {chatgpt_suggestion['details']}")
-        
-        # Test ChatGPT approach
-        print(f"🧪 Testing Fresh ChatGPT suggestion...")
-        
-        backup_dir = backup_project(project_dir)
+    # Only the path and the predicted type are read per row, so plain column arrays suffice
+    file_paths = correct_predictions['file_path'].to_numpy()
+    ml_predictions = correct_predictions['refactoring_type'].to_numpy()
+    
+    # Each record is written as soon as it is known instead of collected for a DataFrame
+    results_file = 'results/fresh_chatgpt_vs_ml_comparison.csv'
+    os.makedirs('results', exist_ok=True)
+    with open(results_file, 'w', newline='') as results_out:
+        writer = csv.DictWriter(results_out, fieldnames=COMPARISON_FIELDS)
+        writer.writeheader()
         
-        try:
-            # Apply ChatGPT suggestion
-            chatgpt_success, chatgpt_result = apply_chatgpt_suggestion(project_dir, chatgpt_key, chatgpt_suggestion)
+        for idx, (file_path, ml_prediction) in enumerate(zip(file_paths, ml_predictions)):
             
-            if chatgpt_success:
-                print(f"✅ Applied ChatGPT suggestion")
-                
-                # Test functionality
-                post_chatgpt_results = run_test_suite(project_dir, "post-chatgpt")
-                
-                baseline_success = baseline_results.get('success', False)
-                post_chatgpt_success = post_chatgpt_results.get('success', False)
-                
-                chatgpt_maintained_correctness = (baseline_success == post_chatgpt_success)
-                
-                status = "✅ SAFE" if chatgpt_maintained_correctness else "❌ UNSAFE"
-                print(f"   Fresh ChatGPT Result: {status}")
-                
-                comparison_record = {
-                    'file_path': file_path,
-                    'ml_prediction': ml_prediction,
-                    'chatgpt_suggestion': chatgpt_suggestion['refactoring_type'],
-                    'chatgpt_details': chatgpt_suggestion['details'],
-                    'chatgpt_reasoning': chatgpt_suggestion['reasoning'],
-                    'chatgpt_applied': True,
-                    'chatgpt_safe': chatgpt_maintained_correctness,
-                    'approaches_agree': ml_prediction == chatgpt_suggestion['refactoring_type'],
-                    'baseline_passed': baseline_success,
-                    'post_chatgpt_passed': post_chatgpt_success
-                }
+            print(f"\n--- Comparison {idx + 1}/{len(correct_predictions)} ---")
+            
+            # Handle multiple ModuleHandler cases
+            chatgpt_key = file_path
+            if 'ModuleHandler.java' in file_path:
+                modulehandler_count += 1
+                if modulehandler_count == 1:
+                    chatgpt_key = file_path  # Change Return Type case
+                elif modulehandler_count == 2:
+                    chatgpt_key = file_path + '_extract'  # Extract Method case
+                elif modulehandler_count == 3:
+                    chatgpt_key = file_path + '_rename'  # Rename Method case
+            
+            if chatgpt_key not in chatgpt_suggestions:
+                print(f"⏭️  Skipping - no ChatGPT suggestion for {file_path}")
+                continue
+            
+            chatgpt_suggestion = chatgpt_suggestions[chatgpt_key]
+            
+            print(f"File: {file_path}")
+            print(f"ML Prediction: {ml_prediction}")
+            print(f"ChatGPT Suggestion: {chatgpt_suggestion['refactoring_type']}")
+            print(f"ChatGPT Details: {chatgpt_suggestion['details']}")
+            
+            # Test ChatGPT approach
+            print(f"🧪 Testing Fresh ChatGPT suggestion...")
+            
+            backup_dir = backup_project(project_dir)
+            
+            try:
+                # Apply ChatGPT suggestion
+                chatgpt_success, chatgpt_result = apply_chatgpt_suggestion(project_dir, chatgpt_key, chatgpt_suggestion)
                 
-            else:
-                print(f"❌ Could not apply ChatGPT suggestion: {chatgpt_result}")
+                if chatgpt_success:
+                    print(f"✅ Applied ChatGPT suggestion")
+                    
+                    # Test functionality
+                    post_chatgpt_results = run_test_suite(project_dir, "post-chatgpt")
+                    
+                    baseline_success = baseline_results.get('success', False)
+                    post_chatgpt_success = post_chatgpt_results.get('success', False)
+                    
+                    # main() aborts unless the baseline passed, so only the post-refactoring run decides
+                    chatgpt_maintained_correctness = post_chatgpt_success
+                    
+                    status = "✅ SAFE" if chatgpt_maintained_correctness else "❌ UNSAFE"
+                    print(f"   Fresh ChatGPT Result: {status}")
+                    
+                    comparison_record = {
+                        'file_path': file_path,
+                        'ml_prediction': ml_prediction,
+                        'chatgpt_suggestion': chatgpt_suggestion['refactoring_type'],
+                        'chatgpt_details': chatgpt_suggestion['details'],
+                        'chatgpt_reasoning': chatgpt_suggestion['reasoning'],
+                        'chatgpt_applied': True,
+                        'chatgpt_safe': chatgpt_maintained_correctness,
+                        'approaches_agree': ml_prediction == chatgpt_suggestion['refactoring_type'],
+                        'baseline_passed': baseline_success,
+                        'post_chatgpt_passed': post_chatgpt_success
+                    }
+                    
+                else:
+                    print(f"❌ Could not apply ChatGPT suggestion: {chatgpt_result}")
+                    comparison_record = {
+                        'file_path': file_path,
+                        'ml_prediction': ml_prediction,
+                        'chatgpt_suggestion': chatgpt_suggestion['refactoring_type'],
+                        'chatgpt_details': chatgpt_suggestion['details'],
+                        'chatgpt_reasoning': chatgpt_suggestion['reasoning'],
+                        'chatgpt_applied': False,
+                        'chatgpt_safe': False,
+                        'approaches_agree': ml_prediction == chatgpt_suggestion['refactoring_type'],
+                        'error': chatgpt_result
+                    }
+            
+            except Exception as e:
+                print(f"❌ Error testing ChatGPT suggestion: {e}")
                 comparison_record = {
                     'file_path': file_path,
                     'ml_prediction': ml_prediction,
                     'chatgpt_suggestion': chatgpt_suggestion['refactoring_type'],
-                    'chatgpt_details': chatgpt_suggestion['details'],
-                    'chatgpt_reasoning': chatgpt_suggestion['reasoning'],
                     'chatgpt_applied': False,
                     'chatgpt_safe': False,
-                    'approaches_agree': ml_prediction == chatgpt_suggestion['refactoring_type'],
-                    'error': chatgpt_result
+                    'approaches_agree': False,
+                    'error': str(e)
                 }
-        
-        except Exception as e:
-            print(f"❌ Error testing ChatGPT suggestion: {e}")
-            comparison_record = {
-                'file_path': file_path,
-                'ml_prediction': ml_prediction,
-                'chatgpt_suggestion': chatgpt_suggestion['refactoring_type'],
-                'chatgpt_applied': False,
-                'chatgpt_safe': False,
-                'approaches_agree': False,
-                'error': str(e)
-            }
-        
-        finally:
-            restore_project(project_dir, backup_dir)
-        
-        comparison_results.append(comparison_record)
+            
+            finally:
+                restore_project(project_dir, backup_dir)
+            
+            writer.writerow(comparison_record)
+            
+            # Only counters and the short detail lines stay in memory
+            total_comparisons += 1
+            chatgpt_applied_count += comparison_record['chatgpt_applied']
+            chatgpt_safe_count += comparison_record['chatgpt_safe']
+            agreement_count += comparison_record['approaches_agree']
+            comparison_details.append((comparison_record['approaches_agree'], comparison_record['chatgpt_safe'],
+                                       file_path, ml_prediction, comparison_record['chatgpt_suggestion'],
+                                       comparison_record.get('chatgpt_details', '')))
     
     # Analysis
     print(f"\n📊 FRESH CHATGPT vs ML COMPARISON RESULTS")
     print("=" * 70)
     
-    total_comparisons = len(comparison_results)
-    chatgpt_applied_count = sum(1 for r in comparison_results if r.get('chatgpt_applied', False))
-    chatgpt_safe_count = sum(1 for r in comparison_results if r.get('chatgpt_safe', False))
-    agreement_count = sum(1 for r in comparison_results if r.get('approaches_agree', False))
-    
     print(f"Total comparisons: {total_comparisons}")
     print(f"Fresh ChatGPT suggestions applied: {chatgpt_applied_count}")
     print(f"Fresh ChatGPT suggestions safe: {chatgpt_safe_count}")
@@ -459,19 +443,14 @@ def main():
     
     # Detailed results
     print(f"\nDetailed Comparison:")
-    for result in comparison_results:
-        agree_symbol = "✅" if result.get('approaches_agree', False) else "❌"
-        safe_symbol = "✅" if result.get('chatgpt_safe', False) else "❌"
+    for agrees, safe, file_path, ml_prediction, chatgpt_suggestion, chatgpt_details in comparison_details:
+        agree_symbol = "✅" if agrees else "❌"
+        safe_symbol = "✅" if safe else "❌"
         
-        print(f"  {agree_symbol} {safe_symbol} {os.path.basename(result['file_path'])}")
-        print(f"      ML: {result['ml_prediction']}")
-        print(f"      ChatGPT: {result['chatgpt_suggestion']} - {result['chatgpt_details']}")
+        print(f"  {agree_symbol} {safe_symbol} {os.path.basename(file_path)}")
+        print(f"      ML: {ml_prediction}")
+        print(f"      ChatGPT: {chatgpt_suggestion} - {chatgpt_details}")
     
-    # Save results
-    results_df = pd.DataFrame(comparison_results)
-    results_file = 'results/fresh_chatgpt_vs_ml_comparison.csv'
-    os.makedirs('results', exist_ok=True)
-    results_df.to_csv(results_file, index=False)
     print(f"\n💾 Results saved to {results_file}")
     
     print(f"\n🎯 KEY RESEARCH FINDINGS:")
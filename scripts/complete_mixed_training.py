@@ -6,62 +6,42 @@ Complete Mixed Domain Training: Include Apache Commons/Gson in 70-30 split
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.utils.class_weight import compute_class_weight
 import joblib
+from _splits import get_split, feature_matrix, prediction_tally
 
 def load_all_domains_with_splits():
     """Load all 4 domains and create 70-30 splits"""
     
-    domains_data = []
-    
-    # 1. Apache Commons/Gson (original training data) - needs encoding
-    apache_df = pd.read_csv('data/enhanced_dataset.csv')
-    apache_df['domain'] = 'apache_commons_gson'
-    # Add missing encoded columns
-    apache_df['class_encoded'] = pd.Categorical(apache_df['class_name'].fillna('')).codes
-    apache_df['method_encoded'] = pd.Categorical(apache_df['method_name'].fillna('')).codes
-    domains_data.append(('apache_commons_gson', apache_df))
-    
-    # 2. Other domains (already have encoded columns)
-    other_domains = [
+    # Apache Commons/Gson (original training data) is encoded on first load;
+    # the other domains already have encoded columns
+    domains = [
+        ('apache_commons_gson', 'data/enhanced_dataset.csv'),
         ('intellij', 'data/intellij_enhanced_dataset.csv'),
         ('mockito', 'data/mockito_enhanced_dataset.csv'),
         ('elasticsearch', 'data/elasticsearch_enhanced_dataset.csv')
     ]
     
-    for domain_name, file_path in other_domains:
-        try:
-            df = pd.read_csv(file_path)
-            df['domain'] = domain_name
-            domains_data.append((domain_name, df))
-        except Exception as e:
-            print(f"Could not load {domain_name}: {e}")
-    
     # Create 70-30 splits for each domain
     train_parts = []
     test_parts = []
     
     print("=== DOMAIN SPLITS ===")
-    for domain_name, df in domains_data:
-        # Filter rare classes for stratification
-        class_counts = df['refactoring_type'].value_counts()
-        valid_classes = class_counts[class_counts >= 2].index
-        df_filtered = df[df['refactoring_type'].isin(valid_classes)]
+    for domain_name, file_path in domains:
+        try:
+            train_df, test_df = get_split(file_path)
+        except Exception as e:
+            print(f"Could not load {domain_name}: {e}")
+            continue
         
-        # 70-30 split
-        train_df, test_df = train_test_split(
-            df_filtered, 
-            test_size=0.3, 
-            random_state=42, 
-            stratify=df_filtered['refactoring_type']
-        )
+        train_df = train_df.assign(domain=domain_name)
+        test_df = test_df.assign(domain=domain_name)
         
         train_parts.append(train_df)
         test_parts.append((domain_name, test_df))
         
-        print(f"{domain_name}: {len(df)} total → {len(train_df)} train, {len(test_df)} test")
+        print(f"{domain_name}: {len(train_df) + len(test_df)} after filtering rare classes → {len(train_df)} train, {len(test_df)} test")
     
     # Combine all 70% for training
     combined_train = pd.concat(train_parts, ignore_index=True)
@@ -74,8 +54,7 @@ def load_all_domains_with_splits():
 def train_complete_model(train_df):
     """Train on combined 70% from all 4 domains"""
     
-    feature_cols = ['class_encoded', 'method_encoded', 'lines_changed', 'cyclomatic_complexity', 'nesting_depth']
-    X_train = train_df[feature_cols].fillna(0)
+    X_train = feature_matrix(train_df)
     y_train = train_df['refactoring_type']
     
     print(f"\nTRAINING DATA ANALYSIS:")
@@ -108,43 +87,41 @@ def train_complete_model(train_df):
 def test_all_domains(model, test_parts):
     """Test on all domain 30% splits + combined"""
     
-    feature_cols = ['class_encoded', 'method_encoded', 'lines_changed', 'cyclomatic_complexity', 'nesting_depth']
-    
     print(f"\n=== INDIVIDUAL DOMAIN RESULTS ===")
     
     domain_results = {}
-    all_test_data = []
     
-    for domain_name, test_df in test_parts:
-        X_test = test_df[feature_cols].fillna(0)
-        y_test = test_df['refactoring_type']
-        y_pred = model.predict(X_test)
+    # One predict call over every domain, sliced back per domain afterwards
+    X_all = np.concatenate([feature_matrix(test_df) for _, test_df in test_parts])
+    y_all = pd.concat([test_df['refactoring_type'] for _, test_df in test_parts], ignore_index=True)
+    pred_all = model.predict(X_all)
+    bounds = np.cumsum([0] + [len(test_df) for _, test_df in test_parts])
+    
+    # A single vectorised comparison serves every per-domain and combined accuracy
+    correct_all = y_all.to_numpy() == pred_all
+    
+    for (domain_name, _), start, end in zip(test_parts, bounds[:-1], bounds[1:]):
+        y_test = y_all.iloc[start:end]
+        y_pred = pred_all[start:end]
         
-        accuracy = accuracy_score(y_test, y_pred)
+        accuracy = correct_all[start:end].mean()
         domain_results[domain_name] = accuracy
         
-        # Store for combined analysis
-        all_test_data.extend(list(zip(X_test.values, y_test, y_pred)))
-        
         print(f"\n{domain_name.upper()}:")
         print(f"  Accuracy: {accuracy:.1%}")
-        print(f"  Test size: {len(X_test)}")
-        print(f"  Unique predictions: {len(set(y_pred))}")
+        print(f"  Test size: {len(y_test)}")
+        unique_count, top_predictions = prediction_tally(y_pred)
+        print(f"  Unique predictions: {unique_count}")
         
         # Show top predictions
-        pred_counts = pd.Series(y_pred).value_counts().head(3)
-        print(f"  Top predictions: {pred_counts.to_dict()}")
+        print(f"  Top predictions: {top_predictions}")
     
     # Combined test performance
-    all_X = [item[0] for item in all_test_data]
-    all_y_true = [item[1] for item in all_test_data]
-    all_y_pred = [item[2] for item in all_test_data]
-    
-    combined_accuracy = accuracy_score(all_y_true, all_y_pred)
+    combined_accuracy = correct_all.mean()
     
     print(f"\n=== COMBINED TEST RESULTS ===")
     print(f"Overall accuracy: {combined_accuracy:.1%}")
-    print(f"Total test instances: {len(all_y_true)}")
+    print(f"Total test instances: {len(y_all)}")
     
     return domain_results, combined_accuracy
 
@@ -4,60 +4,134 @@ Extract real complexity features from Java source code for refactoring analysis
 """
 
 import json
+import mmap
+import numpy as np
 import pandas as pd
 import subprocess
 import os
+from collections import OrderedDict
 from pathlib import Path
 import re
 
+# Decision keywords and operators that increase complexity, counted in a single pass
+_DECISION_POINT_RE = re.compile(r'\b(?:if|else|while|for|case|catch)\b|&&|\|\||\?')
+# Same pattern over raw bytes; only valid for ASCII input, where \b agrees with the str version
+_DECISION_POINT_BYTES_RE = re.compile(_DECISION_POINT_RE.pattern.encode())
+
+# Mapped files per (path, mtime, size), least recently used first; evicted maps are closed
+_MAPPED_FILES_MAX = 64
+_mapped_files = OrderedDict()
+
+def _read_file(file_path, mtime_ns, size):
+    """Memory-map a source file and index its newline offsets (cached per file version)"""
+    key = (file_path, mtime_ns, size)
+    cached = _mapped_files.get(key)
+    if cached is not None:
+        _mapped_files.move_to_end(key)
+        return cached
+    
+    if size == 0:
+        # mmap refuses empty files; an empty section gives the same metrics as before
+        content = b''
+        newline_offsets = np.empty(0, dtype=np.int32)
+    else:
+        with open(file_path, 'rb') as f:
+            content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        # Built once per file so every (start, end) slice is an O(1) lookup
+        newline_offsets = np.flatnonzero(np.frombuffer(content, dtype=np.uint8) == 10).astype(np.int32)
+    
+    _mapped_files[key] = (content, newline_offsets)
+    while len(_mapped_files) > _MAPPED_FILES_MAX:
+        evicted, _ = _mapped_files.popitem(last=False)[1]
+        if isinstance(evicted, mmap.mmap):
+            evicted.close()
+    
+    return content, newline_offsets
+
+def read_section_bytes(file_path, start_line, end_line):
+    """Slice lines start_line..end_line (1-based, inclusive) straight from the mapped file"""
+    if end_line < 1:
+        return b''
+    
+    # Keyed on mtime and size too, so a file edited between calls is mapped afresh
+    stat = os.stat(file_path)
+    content, newline_offsets = _read_file(file_path, stat.st_mtime_ns, stat.st_size)
+    
+    # Byte offset of the first character of a 0-based line index
+    first = max(start_line - 1, 0)
+    if first == 0:
+        begin = 0
+    elif first - 1 < len(newline_offsets):
+        begin = newline_offsets[first - 1] + 1
+    else:
+        begin = len(content)
+    end = newline_offsets[end_line - 1] + 1 if end_line - 1 < len(newline_offsets) else len(content)
+    
+    if end <= begin:
+        return b''
+    return content[begin:end]
+
+def read_code_section(file_path, start_line, end_line):
+    """Decoded text of lines start_line..end_line (1-based, inclusive)"""
+    return read_section_bytes(file_path, start_line, end_line).decode('utf-8', 'ignore')
+
+def _complexity_of(section_bytes):
+    """Simplified McCabe complexity of raw source bytes"""
+    # Non-ASCII letters count as word characters in str patterns, so only then decode
+    if section_bytes.isascii():
+        code_section, pattern = section_bytes, _DECISION_POINT_BYTES_RE
+    else:
+        code_section, pattern = section_bytes.decode('utf-8', 'ignore'), _DECISION_POINT_RE
+    
+    # Word boundaries for keywords; operators never overlap them
+    return 1 + sum(1 for _ in pattern.finditer(code_section))
+
+def _nesting_of(section_bytes):
+    """Maximum brace depth of raw source bytes"""
+    # Braces are ASCII, so the raw bytes can be counted without decoding
+    code_section = np.frombuffer(section_bytes, dtype=np.uint8)
+    
+    if len(code_section) == 0:
+        return 1
+    
+    depth = np.cumsum((code_section == ord('{')).astype(np.int32) - (code_section == ord('}')))
+    # Unmatched closing braces never take the depth below zero
+    depth -= np.minimum(np.minimum.accumulate(depth), 0)
+    
+    return max(1, int(depth.max()))  # Minimum depth of 1
+
 def calculate_cyclomatic_complexity(file_path, start_line, end_line):
     """Calculate cyclomatic complexity for code section"""
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        # Extract relevant code section
-        code_section = ''.join(lines[start_line-1:end_line])
-        
-        # Count decision points (simplified McCabe complexity)
-        complexity = 1  # Base complexity
-        
-        # Decision keywords that increase complexity
-        decision_keywords = ['if', 'else', 'while', 'for', 'case', 'catch', '&&', '||', '?']
-        
-        for keyword in decision_keywords:
-            if keyword in ['&&', '||', '?']:
-                complexity += code_section.count(keyword)
-            else:
-                # Use word boundaries for keywords
-                complexity += len(re.findall(r'\b' + keyword + r'\b', code_section))
-        
-        return complexity
+        return _complexity_of(read_section_bytes(file_path, start_line, end_line))
     except:
         return 2  # Default fallback
 
 def calculate_nesting_depth(file_path, start_line, end_line):
     """Calculate maximum nesting depth for code section"""
     try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-        
-        code_section = ''.join(lines[start_line-1:end_line])
-        
-        max_depth = 0
-        current_depth = 0
-        
-        for char in code_section:
-            if char == '{':
-                current_depth += 1
-                max_depth = max(max_depth, current_depth)
-            elif char == '}':
-                current_depth = max(0, current_depth - 1)
-        
-        return max(1, max_depth)  # Minimum depth of 1
+        return _nesting_of(read_section_bytes(file_path, start_line, end_line))
     except:
         return 1  # Default fallback
 
+def calculate_section_metrics(file_path, start_line, end_line):
+    """Complexity and nesting depth from a single read of the code section"""
+    try:
+        section = read_section_bytes(file_path, start_line, end_line)
+    except:
+        return 2, 1  # Same fallbacks as the individual metrics
+    
+    try:
+        complexity = _complexity_of(section)
+    except:
+        complexity = 2
+    try:
+        nesting = _nesting_of(section)
+    except:
+        nesting = 1
+    return complexity, nesting
+
 def extract_complexity_features(json_file, project_path):
     """Extract complexity features from RefactoringMiner JSON"""
     with open(json_file, 'r') as f:
@@ -82,8 +156,7 @@ def extract_complexity_features(json_file, project_path):
             end_line = location.get('endLine', start_line)
             
             # Calculate real complexity metrics
-            complexity = calculate_cyclomatic_complexity(file_path, start_line, end_line)
-            nesting = calculate_nesting_depth(file_path, start_line, end_line)
+            complexity, nesting = calculate_section_metrics(file_path, start_line, end_line)
             
             # Extract other features
             class_name = Path(location['filePath']).stem
@@ -119,9 +192,9 @@ def process_project(project_name, json_file, project_path):
     
     df = extract_complexity_features(json_file, project_path)
     
-    # Encode categorical features
-    df['class_encoded'] = pd.Categorical(df['class_name'].fillna('')).codes
-    df['method_encoded'] = pd.Categorical(df['method_name'].fillna('')).codes
+    # Encode categorical features; the codes match the stored datasets and stay exact in float32
+    df['class_encoded'] = pd.Categorical(df['class_name'].fillna('')).codes.astype(np.int32)
+    df['method_encoded'] = pd.Categorical(df['method_name'].fillna('')).codes.astype(np.int32)
     
     print(f"Extracted {len(df)} instances")
     print(f"Complexity range: {df['cyclomatic_complexity'].min()}-{df['cyclomatic_complexity'].max()}")
@@ -3,12 +3,51 @@
 Extract features from IntelliJ refactorings for model testing
 """
 
+import hashlib
 import json
+import os
 import pandas as pd
 from pathlib import Path
 
+# Extracted rows keyed by the SHA-256 of the source JSON, so edits invalidate themselves
+FEATURE_CACHE_DIR = 'data/.feature_cache'
+
+def compute_file_hash(path, chunk_size=64 * 1024):
+    """SHA-256 of a file, read in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_feature_cache(file_hash):
+    """Cached feature rows for a JSON hash, or None"""
+    try:
+        with open(os.path.join(FEATURE_CACHE_DIR, f"{file_hash}.json"), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_feature_cache(file_hash, features):
+    """Persist feature rows under their JSON hash"""
+    os.makedirs(FEATURE_CACHE_DIR, exist_ok=True)
+    cache_file = os.path.join(FEATURE_CACHE_DIR, f"{file_hash}.json")
+    # Write then rename so an interrupted run never leaves a truncated entry
+    with open(cache_file + '.tmp', 'w') as f:
+        json.dump(features, f)
+    os.replace(cache_file + '.tmp', cache_file)
+
 def extract_basic_features(json_file):
     """Extract basic features from RefactoringMiner JSON"""
+    file_hash = compute_file_hash(json_file)
+    features = read_feature_cache(file_hash)
+    if features is None:
+        features = _extract_feature_rows(json_file)
+        write_feature_cache(file_hash, features)
+    return pd.DataFrame(features)
+
+def _extract_feature_rows(json_file):
+    """One feature dict per refactoring in the JSON"""
     with open(json_file, 'r') as f:
         data = json.load(f)
     
@@ -34,7 +73,7 @@ def extract_basic_features(json_file):
                 'commit_sha': commit['sha1']
             })
     
-    return pd.DataFrame(features)
+    return features
 
 def extract_class_name(file_path):
     """Extract class name from file path"""
@@ -6,30 +6,64 @@ Mine refactorings from projects known for complex refactoring patterns
 import subprocess
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def clone_and_mine(repo_url, project_name):
-    """Clone project and run RefactoringMiner"""
-    workspace = "/Users/parjalrai/Workspace"
-    project_path = f"{workspace}/{project_name}"
+WORKSPACE = "/Users/parjalrai/Workspace"
+REFACTORING_MINER = "/Users/parjalrai/Workspace/RefactoringMiner"
+
+# RefactoringMiner is allocation-heavy (one AST per changed file per commit);
+# the default JVM heap is too small for monorepos and forces constant GC
+JVM_OPTS = [
+    "-Xms2g", "-Xmx8g", "-XX:+UseG1GC", "-XX:MaxGCPauseMillis=200",
+    "-XX:+AlwaysPreTouch", "-XX:+UseStringDeduplication"
+]
+
+def _clone(repo_url, project_path):
+    """Clone project if it is not already present"""
+    if os.path.exists(project_path):
+        return 0
     
-    # Clone if not exists
-    if not os.path.exists(project_path):
-        print(f"Cloning {project_name}...")
-        # Use shallow clone for large repos
-        subprocess.run(["git", "clone", "--depth", "100", repo_url, project_path])
+    project_name = os.path.basename(project_path)
+    print(f"Cloning {project_name}...")
+    # Shallow single-branch clone for large repos. No --filter=blob:none: RefactoringMiner
+    # reads objects through JGit, which cannot fetch promisor blobs on demand
+    clone_cmd = [
+        "git", "clone", "--depth", "100", "--no-tags", "--single-branch",
+        repo_url, project_path
+    ]
+    clone_result = subprocess.run(clone_cmd, check=False)
+    if clone_result.returncode != 0:
+        print(f"Clone of {project_name} failed (exit {clone_result.returncode})")
     
-    # Mine refactorings
-    refactoring_miner = "/Users/parjalrai/Workspace/RefactoringMiner"
+    return clone_result.returncode
+
+def _mine(project_path, project_name):
+    """Run RefactoringMiner over a cloned project"""
     output_file = f"data/{project_name}_refactorings.json"
     
     cmd = [
-        "java", "-jar", f"{refactoring_miner}/build/libs/RefactoringMiner-3.0.11.jar",
+        "java", *JVM_OPTS, "-jar", f"{REFACTORING_MINER}/build/libs/RefactoringMiner-3.0.11.jar",
         "-a", project_path, "-json", output_file
     ]
     
     print(f"Mining {project_name}...")
-    subprocess.run(cmd)
-    print(f"Saved to {output_file}")
+    mine_result = subprocess.run(cmd, check=False)
+    if mine_result.returncode == 0:
+        print(f"Saved to {output_file}")
+    else:
+        print(f"Mining {project_name} failed (exit {mine_result.returncode})")
+    
+    return mine_result.returncode
+
+def clone_and_mine(repo_url, project_name):
+    """Clone project and run RefactoringMiner"""
+    project_path = f"{WORKSPACE}/{project_name}"
+    
+    clone_code = _clone(repo_url, project_path)
+    if clone_code != 0:
+        return clone_code
+    
+    return _mine(project_path, project_name)
 
 def main():
     # Projects known for complex refactorings
@@ -41,16 +75,43 @@ def main():
         "elasticsearch": "https://github.com/elastic/elasticsearch.git"
     }
     
-    # Allow command line selection or default to intellij
-    if len(sys.argv) > 1:
-        project_name = sys.argv[1]
-    else:
-        project_name = "intellij-community"
+    # Allow command line selection ("all" or several names) or default to intellij
+    selected = sys.argv[1:] or ["intellij-community"]
+    if selected == ["all"]:
+        selected = list(projects)
     
-    if project_name in projects:
-        clone_and_mine(projects[project_name], project_name)
-    else:
+    unknown = [name for name in selected if name not in projects]
+    if unknown:
+        print(f"Unknown projects: {unknown}")
         print(f"Available projects: {list(projects.keys())}")
+        return
+    
+    # Created up front so concurrent workers never race on it
+    os.makedirs("data", exist_ok=True)
+    
+    # Pipeline: network-bound clones feed a smaller pool of JVM-bound mining jobs,
+    # so one project downloads while another is being mined
+    failed = []
+    with ThreadPoolExecutor(max_workers=4) as clone_pool, ThreadPoolExecutor(max_workers=2) as mine_pool:
+        clone_futures = {
+            clone_pool.submit(_clone, projects[name], f"{WORKSPACE}/{name}"): name
+            for name in selected
+        }
+        
+        mine_futures = {}
+        for future in as_completed(clone_futures):
+            name = clone_futures[future]
+            if future.result() != 0:
+                failed.append(name)
+                continue
+            mine_futures[mine_pool.submit(_mine, f"{WORKSPACE}/{name}", name)] = name
+        
+        for future in as_completed(mine_futures):
+            if future.result() != 0:
+                failed.append(mine_futures[future])
+    
+    if failed:
+        print(f"Failed projects: {failed}")
 
 if __name__ == "__main__":
     main()
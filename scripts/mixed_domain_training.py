@@ -6,10 +6,10 @@ Mixed Domain Training: Combine 70% from all projects for training, test on 30% s
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import classification_report, accuracy_score
 from sklearn.utils.class_weight import compute_class_weight
 import joblib
+from _splits import get_split, feature_matrix, prediction_tally
 
 def load_and_split_datasets():
     """Load all datasets and create 70-30 splits per domain"""
@@ -25,27 +25,14 @@ def load_and_split_datasets():
     
     for domain_name, file_path in datasets.items():
         try:
-            df = pd.read_csv(file_path)
-            df['domain'] = domain_name
-            
-            # Filter out classes with only 1 instance for stratification
-            class_counts = df['refactoring_type'].value_counts()
-            valid_classes = class_counts[class_counts >= 2].index
-            df_filtered = df[df['refactoring_type'].isin(valid_classes)]
-            
-            print(f"{domain_name}: {len(df)} total, {len(df_filtered)} after filtering rare classes")
-            
-            # 70-30 split for this domain
-            train_df, test_df = train_test_split(
-                df_filtered, 
-                test_size=0.3, 
-                random_state=42, 
-                stratify=df_filtered['refactoring_type']
-            )
+            train_df, test_df = get_split(file_path)
+            train_df = train_df.assign(domain=domain_name)
+            test_df = test_df.assign(domain=domain_name)
             
             train_parts.append(train_df)
             test_parts.append(test_df)
             
+            print(f"{domain_name}: {len(train_df) + len(test_df)} after filtering rare classes")
             print(f"  Split: {len(train_df)} train, {len(test_df)} test")
             
         except Exception as e:
@@ -67,8 +54,7 @@ def train_mixed_model(train_df):
     """Train on combined 70% from all domains"""
     
     # Prepare features
-    feature_cols = ['class_encoded', 'method_encoded', 'lines_changed', 'cyclomatic_complexity', 'nesting_depth']
-    X_train = train_df[feature_cols].fillna(0)
+    X_train = feature_matrix(train_df)
     y_train = train_df['refactoring_type']
     
     print(f"\nClass distribution in combined training set:")
@@ -102,38 +88,38 @@ def train_mixed_model(train_df):
 def test_on_domains(model, test_parts):
     """Test model on each domain's 30% and combined 30%"""
     
-    feature_cols = ['class_encoded', 'method_encoded', 'lines_changed', 'cyclomatic_complexity', 'nesting_depth']
-    
     domain_results = {}
-    all_test_X = []
-    all_test_y = []
-    all_test_pred = []
+    all_test_y_parts = []
+    all_test_pred_parts = []
     
     print(f"\n=== TESTING ON INDIVIDUAL DOMAINS ===")
     
     for test_df in test_parts:
         domain = test_df['domain'].iloc[0]
         
-        X_test = test_df[feature_cols].fillna(0)
+        X_test = feature_matrix(test_df)
         y_test = test_df['refactoring_type']
         y_pred = model.predict(X_test)
         
-        accuracy = accuracy_score(y_test, y_pred)
+        # Plain element-wise comparison; accuracy_score re-validates and re-encodes the labels
+        accuracy = (y_test.to_numpy() == y_pred).mean()
         domain_results[domain] = accuracy
         
         # Store for combined analysis
-        all_test_X.extend(X_test.values.tolist())
-        all_test_y.extend(y_test.tolist())
-        all_test_pred.extend(y_pred.tolist())
+        all_test_y_parts.append(y_test.to_numpy())
+        all_test_pred_parts.append(y_pred)
         
         print(f"\n{domain.upper()}:")
         print(f"  Accuracy: {accuracy:.1%}")
         print(f"  Test size: {len(X_test)}")
-        print(f"  Unique predictions: {len(set(y_pred))}")
-        print(f"  Top predictions: {pd.Series(y_pred).value_counts().head(3).to_dict()}")
+        unique_count, top_predictions = prediction_tally(y_pred)
+        print(f"  Unique predictions: {unique_count}")
+        print(f"  Top predictions: {top_predictions}")
     
     # Combined test performance
-    combined_accuracy = accuracy_score(all_test_y, all_test_pred)
+    all_test_y = np.concatenate(all_test_y_parts)
+    all_test_pred = np.concatenate(all_test_pred_parts)
+    combined_accuracy = (all_test_y == all_test_pred).mean()
     
     print(f"\n=== COMBINED TEST SET PERFORMANCE ===")
     print(f"Overall accuracy: {combined_accuracy:.1%}")
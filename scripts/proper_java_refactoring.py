@@ -5,89 +5,368 @@ Proper Java Refactoring - Handle references and dependencies correctly
 
 import os
 import re
+import sys
 import glob
+import mmap
+import hashlib
+import time
+import uuid
+import shutil
+import threading
+import subprocess
+import numpy as np
+from functools import lru_cache
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# One match per line that opens a method body (anchored so it never spans lines)
+_METHOD_SIGNATURE_LINE = re.compile(r'^.*(public|private|protected).*\w+[^\S\n]*\([^)\n]*\)[^\S\n]*\{', re.MULTILINE)
+
+# A declaration line: anchored at its start (after any annotations and leading modifiers)
+# and kept to that line, so the match is never retried from inside comments, string
+# literals or field initialisers; the possessive name gives up after one try per word
+_METHOD_DECL_PREFIX = (r'^[ \t]*(?:@\w+(?:\([^)\n]*\))?[ \t]+)*(?:(?:static|final|abstract|synchronized)[ \t]+)*'
+                       r'(public|private|protected)\b[^\n;{}"=]*?')
+
+# Fixed patterns, compiled once at import
+_METHOD_DECL_RE = re.compile(_METHOD_DECL_PREFIX + r'\b(\w++)\s*\([^)]*\)\s*\{', re.MULTILINE)
+_TYPED_METHOD_DECL_RE = re.compile(_METHOD_DECL_PREFIX + r'\b(String|int|boolean)\s+(\w++)\s*\([^)]*\)\s*\{', re.MULTILINE)
+_VARIABLE_ASSIGN_RE = re.compile(r'(\w+)\s+(\w+)\s*=')
+_FIELD_DECL_RE = re.compile(r'(\s*)(private|protected|public)(\s+)(static\s+)?(\w+)\s+(\w+)\s*[=;]')
+_PACKAGE_RE = re.compile(r'package\s+([^;]+);')
+_INT_RETURN_RE = re.compile(r'return\s+(\d+);')
+_LOWER_IDENTIFIER_RE = re.compile(r'\b([a-z][a-zA-Z0-9]*)\b')
+
+@lru_cache(maxsize=4096)
+def _call_re(name):
+    """Pattern for a call to the named method: name( or obj.name("""
+    return re.compile(rf'\b{re.escape(name)}\s*\(')
+
+@lru_cache(maxsize=4096)
+def _line_call_re(name):
+    """Bytes _call_re that stays within one line, for scanning a raw buffer at once"""
+    return re.compile(rb'\b' + re.escape(name.encode()) + rb'[^\S\n]*\(')
+
+# Comments and string, char and text-block literals, which renames must pass over
+_LITERAL_OR_COMMENT = r'//[^\n]*|/\*[\s\S]*?\*/|"""[\s\S]*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\''
+
+@lru_cache(maxsize=4096)
+def _code_only_re(pattern):
+    """Pattern that consumes literals and comments whole, so matches land only in code"""
+    return re.compile(rf'(?P<literal>{_LITERAL_OR_COMMENT})|{pattern}')
+
+def sub_in_code(pattern, replacement, content):
+    """re.subn for a pattern string that leaves comments and literals untouched"""
+    count = 0
+    
+    def substitute(match):
+        nonlocal count
+        if match.group('literal') is not None:
+            return match.group(0)
+        count += 1
+        return replacement(match)
+    
+    return _code_only_re(pattern).sub(substitute, content), count
+
+@lru_cache(maxsize=4096)
+def _method_decl_re(method_name, return_type=r'\w+'):
+    """Pattern for the declaration of the named method, capturing its indent"""
+    return re.compile(rf'(\s*)(public|private|protected)(\s+)(static\s+)?({return_type})\s+{re.escape(method_name)}\s*\([^)]*\)\s*\{{')
+
+# Java file lists per project and raw source bytes per file, so a refactoring walks and
+# reads the tree once; write_java_file and restore_journal evict whatever they replace
+_java_file_lists = {}
+_source_cache = {}
+
+# Validator threads share these caches; every read-modify of the dicts happens under this
+# lock, while walks, file reads and tokenising run outside it
+_cache_lock = threading.Lock()
+
+# Per-project inverted index of identifier -> files, so a lookup visits only files that
+# contain the name; rewritten files are marked stale and re-tokenised on the next lookup
+_token_indexes = {}
+_TOKEN_RE = re.compile(rb'\w+')
+
+# Sources above this size (REFACTOR_MAX_SCAN_BYTES, default 5 MB) are generated code;
+# no scanner reads them and no refactoring targets or rewrites them
+MAX_SCAN_BYTES = int(os.environ.get('REFACTOR_MAX_SCAN_BYTES', 5 * 1024 * 1024))
+
+# Read-only scans memory-map sources this large instead of holding them in the cache
+MMAP_SCAN_BYTES = 1_000_000
+
+# Threads that read a project's sources into the cache on its first scan
+SOURCE_READ_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+
+# Build outputs and tool state; generated sources there are not the project's own.
+# The same names are also real package directories (e.g. com/intellij/build), so they
+# are only pruned when they sit next to a build file
+_SKIPPED_DIRS = {'build', 'target', 'out', 'node_modules'}
+_BUILD_FILES = {'build.gradle', 'build.gradle.kts', 'pom.xml', 'build.xml', 'package.json'}
+
+def _walk_java_files(directory):
+    """Yield .java paths below a directory, classifying entries from scandir's dirent type"""
+    with os.scandir(directory) as entries:
+        entries = list(entries)
+    
+    is_module_root = any(entry.name in _BUILD_FILES for entry in entries)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            if entry.name.startswith('.') or (is_module_root and entry.name in _SKIPPED_DIRS):
+                continue
+            yield from _walk_java_files(entry.path)
+        elif entry.name.endswith('.java'):
+            yield entry.path
+
 def find_all_java_files(project_dir):
     """Find all Java files in the project"""
-    java_files = []
-    for root, dirs, files in os.walk(project_dir):
-        for file in files:
-            if file.endswith('.java'):
-                java_files.append(os.path.join(root, file))
-    return java_files
+    return list(_walk_java_files(project_dir))
+
+def project_java_files(project_dir):
+    """Cached find_all_java_files; refactorings never add or remove sources"""
+    key = os.path.abspath(project_dir)
+    # A recreated workspace has a new root mtime, so its old listing is not reused
+    mtime = os.stat(project_dir).st_mtime_ns
+    with _cache_lock:
+        cached = _java_file_lists.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, find_all_java_files(project_dir))
+        with _cache_lock:
+            _java_file_lists[key] = cached
+    return cached[1]
+
+def read_java_bytes(file_path):
+    """Read a source file undecoded, served from the cache until it is rewritten"""
+    key = os.path.abspath(file_path)
+    with _cache_lock:
+        data = _source_cache.get(key)
+    if data is None:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        with _cache_lock:
+            _source_cache[key] = data
+    return data
+
+def read_java_file(file_path):
+    """Read a source file as text, with newlines normalised like text-mode open()"""
+    content = read_java_bytes(file_path).decode('utf-8')
+    if '\r' in content:
+        content = content.replace('\r\n', '\n').replace('\r', '\n')
+    return content
+
+@contextmanager
+def scan_buffer(file_path):
+    """Bytes-like view of a source for read-only scans (use .find, not `in`, on it)"""
+    with _cache_lock:
+        data = _source_cache.get(os.path.abspath(file_path))
+    if data is None and os.path.getsize(file_path) >= MMAP_SCAN_BYTES:
+        # The page cache serves the scan; no copy of the file is made or kept
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+        return
+    yield read_java_bytes(file_path) if data is None else data
+
+def within_scan_cap(file_path):
+    """Whether a source is small enough to scan or rewrite"""
+    try:
+        return os.path.getsize(file_path) <= MAX_SCAN_BYTES
+    except OSError:
+        return False
+
+def _count_newlines(buffer, start, end):
+    """Newlines in buffer[start:end]; mmap has no count(), so it is counted from a slice"""
+    if isinstance(buffer, bytes):
+        return buffer.count(b'\n', start, end)
+    return buffer[start:end].count(b'\n')
+
+def _read_quietly(file_path):
+    """read_java_bytes for cache warming; failures resurface when the scan reads again"""
+    try:
+        if os.path.getsize(file_path) < MMAP_SCAN_BYTES:
+            read_java_bytes(file_path)
+    except Exception:
+        pass
+
+def warm_source_cache(java_files):
+    """Read all uncached sources concurrently; file reads release the GIL"""
+    with _cache_lock:
+        missing = [path for path in java_files if os.path.abspath(path) not in _source_cache]
+    if len(missing) < 64:
+        return
+    
+    with ThreadPoolExecutor(max_workers=SOURCE_READ_WORKERS) as executor:
+        list(executor.map(_read_quietly, missing))
+
+def _evict_source(file_path):
+    """Forget a rewritten file's cached bytes and tokens"""
+    key = os.path.abspath(file_path)
+    with _cache_lock:
+        _source_cache.pop(key, None)
+        for index in _token_indexes.values():
+            if key in index['paths']:
+                index['stale'].add(key)
+
+def _index_file(index, key):
+    """(Re)tokenise one file into a project index"""
+    path = index['paths'][key]
+    for token in index['tokens'].pop(key, ()):
+        index['postings'][token].discard(path)
+    
+    try:
+        if os.path.getsize(path) > MAX_SCAN_BYTES:
+            tokens = set()
+        else:
+            with scan_buffer(path) as content:
+                tokens = set(_TOKEN_RE.findall(content))
+    except OSError:
+        tokens = set()
+    
+    index['tokens'][key] = tokens
+    for token in tokens:
+        index['postings'].setdefault(token, set()).add(path)
+
+def token_index(project_dir):
+    """Identifier -> set of files for a project, built on first use and kept current"""
+    java_files = project_java_files(project_dir)
+    with _cache_lock:
+        index = _token_indexes.get(os.path.abspath(project_dir))
+    
+    if index is None or index['java_files'] is not java_files:
+        # The first lookup in a project is bound by reading files, later ones hit the cache
+        warm_source_cache(java_files)
+        index = {'java_files': java_files, 'paths': {os.path.abspath(path): path for path in java_files},
+                 'tokens': {}, 'postings': {}, 'stale': set()}
+        for key in index['paths']:
+            _index_file(index, key)
+        with _cache_lock:
+            _token_indexes[os.path.abspath(project_dir)] = index
+    
+    while True:
+        with _cache_lock:
+            if not index['stale']:
+                break
+            key = index['stale'].pop()
+        _index_file(index, key)
+    
+    return index
+
+def files_containing_token(project_dir, token):
+    """Project files in which the identifier occurs, in listing order"""
+    index = token_index(project_dir)
+    candidates = index['postings'].get(token.encode(), set())
+    return [path for path in index['java_files'] if path in candidates]
+
+def forget_project(project_dir):
+    """Drop cached file lists and contents for a project replaced wholesale"""
+    prefix = os.path.join(os.path.abspath(project_dir), '')
+    with _cache_lock:
+        _java_file_lists.pop(os.path.abspath(project_dir), None)
+        _token_indexes.pop(os.path.abspath(project_dir), None)
+        for key in [key for key in _source_cache if key.startswith(prefix)]:
+            del _source_cache[key]
 
 def find_method_references(project_dir, method_name, class_name=None):
     """Find all references to a method across the entire project"""
-    java_files = find_all_java_files(project_dir)
     references = []
     
+    # A call matches only where the name is a whole identifier, so the index
+    # narrows the scan to files containing it; other names scan every file
+    if method_name.isascii() and method_name.replace('_', 'a').isalnum():
+        java_files = files_containing_token(project_dir, method_name)
+    else:
+        java_files = [path for path in project_java_files(project_dir) if within_scan_cap(path)]
+    
     # Pattern to find method calls: methodName( or object.methodName(
-    call_pattern = rf'\b{re.escape(method_name)}\s*\('
+    # Scanned as bytes - Java sources are nearly all ASCII, so decoding is wasted work
+    call_pattern = _line_call_re(method_name)
+    name_bytes = method_name.encode()
     
     for java_file in java_files:
         try:
-            with open(java_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                lines = content.split('\n')
+            with scan_buffer(java_file) as content:
+                # A plain substring scan rules out most files before the regex runs
+                if content.find(name_bytes) == -1:
+                    continue
                 
-                for line_num, line in enumerate(lines, 1):
-                    if re.search(call_pattern, line):
-                        references.append({
-                            'file': java_file,
-                            'line_number': line_num,
-                            'line_content': line.strip(),
-                            'full_content': content
-                        })
+                # One pass over the buffer; line numbers are counted between matches
+                line_num, pos, last_line = 1, 0, 0
+                for match in call_pattern.finditer(content):
+                    line_num += _count_newlines(content, pos, match.start())
+                    pos = match.start()
+                    if line_num == last_line:
+                        continue
+                    last_line = line_num
+                    
+                    line_start = content.rfind(b'\n', 0, pos) + 1
+                    line_end = content.find(b'\n', pos)
+                    line = content[line_start:line_end if line_end != -1 else len(content)]
+                    references.append({
+                        'file': java_file,
+                        'line_number': line_num,
+                        'line_content': line.decode('utf-8', errors='replace').strip()
+                    })
         except Exception as e:
             print(f"Warning: Could not read {java_file}: {e}")
     
     return references
 
-def apply_proper_rename_method(file_path, project_dir, old_method_name, new_method_name):
-    """Properly rename method and all its references"""
-    
-    print(f"🔍 Finding all references to method '{old_method_name}'...")
-    
-    # Find all references across the project
-    references = find_method_references(project_dir, old_method_name)
+def apply_batch_renames(project_dir, renames, method_calls=True, files=None):
+    """Apply several renames with one alternation pass per file, rewriting each file once"""
+    if not renames:
+        return []
+    
+    # Longest names first so a name is never shadowed by one of its prefixes
+    names = '|'.join(re.escape(name) for name in sorted(renames, key=len, reverse=True))
+    if method_calls:
+        # Replace method calls: methodName( -> newMethodName(
+        pattern = rf'\b(?P<name>{names})\s*\('
+        replacement = lambda match: f"{renames[match.group('name')]}("
+    else:
+        pattern = rf'\b(?P<name>{names})\b'
+        replacement = lambda match: renames[match.group('name')]
     
-    print(f"📍 Found {len(references)} references across {len(set(ref['file'] for ref in references))} files")
+    if files is None:
+        files = [path for name in renames for path in files_containing_token(project_dir, name)]
     
     changes_made = []
-    
-    # Update all references
-    for ref in references:
-        ref_file = ref['file']
-        
+    # Files repeat when several names (or references) share them
+    for java_file in dict.fromkeys(files):
         try:
-            with open(ref_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Replace method calls: methodName( -> newMethodName(
-            old_pattern = rf'\b{re.escape(old_method_name)}\s*\('
-            new_replacement = f'{new_method_name}('
-            
-            updated_content = re.sub(old_pattern, new_replacement, content)
+            updated_content, count = sub_in_code(pattern, replacement, read_java_file(java_file))
             
-            if updated_content != content:
-                with open(ref_file, 'w', encoding='utf-8') as f:
-                    f.write(updated_content)
-                
+            if count and write_java_file(java_file, updated_content):
                 changes_made.append({
-                    'file': ref_file,
-                    'type': 'method_call_update'
+                    'file': java_file,
+                    'type': 'method_call_update' if method_calls else 'identifier_update',
+                    'replacements': count
                 })
         
         except Exception as e:
-            print(f"Warning: Could not update {ref_file}: {e}")
+            print(f"Warning: Could not update {java_file}: {e}")
+    
+    return changes_made
+
+def apply_proper_rename_method(file_path, project_dir, old_method_name, new_method_name):
+    """Properly rename method and all its references"""
+    
+    print(f"🔍 Finding all references to method '{old_method_name}'...")
+    
+    # Find all references across the project
+    references = find_method_references(project_dir, old_method_name)
+    files_to_update = list(dict.fromkeys(ref['file'] for ref in references))
+    
+    print(f"📍 Found {len(references)} references across {len(files_to_update)} files")
+    
+    # Each referencing file is rewritten once, from the text the search already read
+    changes_made = apply_batch_renames(project_dir, {old_method_name: new_method_name}, files=files_to_update)
+    files_modified = {change['file'] for change in changes_made}
     
     transformation = {
         'type': 'Rename Method (Proper)',
         'old_name': old_method_name,
         'new_name': new_method_name,
         'references_updated': len(changes_made),
-        'files_modified': len(set(change['file'] for change in changes_made)),
+        'files_modified': len(files_modified),
         'location': file_path
     }
     
@@ -102,17 +381,19 @@ def apply_proper_rename_variable(file_path, project_dir, old_var_name, new_var_n
     except Exception as e:
         return False, f"Could not read file: {e}"
     
+    # A substring miss settles it without running the regex
+    if old_var_name not in content:
+        return False, "No variable references found to rename"
+    
     # For variables, we only update within the same file (scope limitation)
-    # Use word boundaries to avoid partial matches
-    var_pattern = rf'\b{re.escape(old_var_name)}\b'
-    updated_content = re.sub(var_pattern, new_var_name, content)
+    # Use word boundaries to avoid partial matches; text in strings and comments is kept
+    updated_content, _ = sub_in_code(rf'\b{re.escape(old_var_name)}\b', lambda match: new_var_name, content)
     
     if updated_content == content:
         return False, "No variable references found to rename"
     
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(updated_content)
+        write_java_file(file_path, updated_content)
     except Exception as e:
         return False, f"Could not write file: {e}"
     
@@ -134,15 +415,16 @@ def apply_proper_add_method_annotation(file_path, project_dir, method_name, anno
     except Exception as e:
         return False, f"Could not read file: {e}"
     
-    # Find the method declaration
-    method_pattern = rf'(\s*)(public|private|protected)(\s+)(static\s+)?(\w+)\s+{re.escape(method_name)}\s*\([^)]*\)\s*\{{'
+    if method_name not in content:
+        return False, f"Method {method_name} not found"
     
-    match = re.search(method_pattern, content)
+    # Find the method declaration
+    match = _method_decl_re(method_name).search(content)
     if not match:
         return False, f"Method {method_name} not found"
     
     # Check if annotation already exists
-    lines_before = content[:match.start()].split('\n')
+    lines_before = content[:match.start()].rsplit('\n', 3)
     for line in lines_before[-3:]:  # Check 3 lines before method
         if annotation.strip() in line:
             return False, f"Annotation {annotation} already exists"
@@ -154,8 +436,7 @@ def apply_proper_add_method_annotation(file_path, project_dir, method_name, anno
     updated_content = content.replace(match.group(0), annotated_method)
     
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(updated_content)
+        write_java_file(file_path, updated_content)
     except Exception as e:
         return False, f"Could not write file: {e}"
     
@@ -177,10 +458,11 @@ def apply_proper_change_return_type(file_path, project_dir, method_name, old_typ
     except Exception as e:
         return False, f"Could not read file: {e}"
     
-    # Find method declaration
-    method_pattern = rf'(public|private|protected)(\s+)(static\s+)?{re.escape(old_type)}\s+{re.escape(method_name)}\s*\([^)]*\)\s*\{{'
+    if method_name not in content or old_type not in content:
+        return False, f"Method {method_name} with return type {old_type} not found"
     
-    match = re.search(method_pattern, content)
+    # Find method declaration
+    match = _method_decl_re(method_name, re.escape(old_type)).search(content)
     if not match:
         return False, f"Method {method_name} with return type {old_type} not found"
     
@@ -195,11 +477,13 @@ def apply_proper_change_return_type(file_path, project_dir, method_name, old_typ
         pass
     elif old_type == 'int' and new_type == 'long':
         # Update return statements: return 5; -> return 5L;
-        updated_content = re.sub(r'return\s+(\d+);', r'return \1L;', updated_content)
+        updated_content = _INT_RETURN_RE.sub(r'return \1L;', updated_content)
+    
+    if updated_content == content:
+        return False, "Return type change left the file unchanged"
     
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(updated_content)
+        write_java_file(file_path, updated_content)
     except Exception as e:
         return False, f"Could not write file: {e}"
     
@@ -213,12 +497,70 @@ def apply_proper_change_return_type(file_path, project_dir, method_name, old_typ
     
     return True, transformation
 
+def _transform_rename_method(file_path, project_dir, content):
+    """Rename the first declared method"""
+    match = _METHOD_DECL_RE.search(content)
+    if not match:
+        return False, "No methods found to rename"
+    
+    old_method_name = match.group(2)
+    return apply_proper_rename_method(file_path, project_dir, old_method_name, f"{old_method_name}Renamed")
+
+def _transform_rename_variable(file_path, project_dir, content):
+    """Rename the first assigned variable"""
+    match = _VARIABLE_ASSIGN_RE.search(content)
+    if not match:
+        return False, "No variables found to rename"
+    
+    old_var_name = match.group(2)
+    return apply_proper_rename_variable(file_path, project_dir, old_var_name, f"{old_var_name}Renamed")
+
+def _transform_add_method_annotation(file_path, project_dir, content):
+    """Annotate the first declared method"""
+    match = _METHOD_DECL_RE.search(content)
+    if not match:
+        return False, "No methods found to annotate"
+    
+    annotation = '@Override'  # Safe annotation
+    return apply_proper_add_method_annotation(file_path, project_dir, match.group(2), annotation)
+
+def _transform_change_return_type(file_path, project_dir, content):
+    """Widen the return type of the first String/int/boolean method"""
+    match = _TYPED_METHOD_DECL_RE.search(content)
+    if not match:
+        return False, "No methods with changeable return types found"
+    
+    old_type = match.group(2)
+    method_name = match.group(3)
+    
+    type_mappings = {'String': 'Object', 'int': 'long', 'boolean': 'Boolean'}
+    new_type = type_mappings.get(old_type, 'Object')
+    
+    return apply_proper_change_return_type(file_path, project_dir, method_name, old_type, new_type)
+
+# Refactoring type -> transformation, looked up once per call instead of walking an elif chain
+_TRANSFORMATIONS = {
+    'Rename Method': _transform_rename_method,
+    'Rename Variable': _transform_rename_variable,
+    'Add Method Annotation': _transform_add_method_annotation,
+    'Change Return Type': _transform_change_return_type,
+    'Move Class': lambda file_path, project_dir, content: apply_proper_move_class(file_path, project_dir),
+    'Extract Method': lambda file_path, project_dir, content: apply_proper_extract_method(file_path, project_dir),
+    'Change Attribute Type': lambda file_path, project_dir, content: apply_proper_change_attribute_type(file_path, project_dir),
+}
+
 def apply_proper_refactoring_transformation(file_path, refactoring_type, project_dir):
     """Apply proper refactoring with full project context"""
     
-    if not os.path.exists(file_path):
+    # One stat answers both the existence and the size check
+    try:
+        file_size = os.stat(file_path).st_size
+    except OSError:
         return False, f"File not found: {file_path}"
     
+    if file_size > MAX_SCAN_BYTES:
+        return False, f"File exceeds {MAX_SCAN_BYTES} byte scan limit: {file_path}"
+    
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             original_content = f.read()
@@ -226,76 +568,11 @@ def apply_proper_refactoring_transformation(file_path, refactoring_type, project
         return False, f"Error reading file: {e}"
     
     # Apply transformation based on type
-    if refactoring_type == 'Rename Method':
-        # Find a method to rename
-        method_pattern = r'(public|private|protected).*?(\w+)\s*\([^)]*\)\s*\{'
-        matches = list(re.finditer(method_pattern, original_content))
-        
-        if not matches:
-            return False, "No methods found to rename"
-        
-        match = matches[0]  # Take first method
-        old_method_name = match.group(2)
-        new_method_name = f"{old_method_name}Renamed"
-        
-        return apply_proper_rename_method(file_path, project_dir, old_method_name, new_method_name)
-    
-    elif refactoring_type == 'Rename Variable':
-        # Find a variable to rename
-        var_pattern = r'(\w+)\s+(\w+)\s*='
-        matches = list(re.finditer(var_pattern, original_content))
-        
-        if not matches:
-            return False, "No variables found to rename"
-        
-        match = matches[0]
-        old_var_name = match.group(2)
-        new_var_name = f"{old_var_name}Renamed"
-        
-        return apply_proper_rename_variable(file_path, project_dir, old_var_name, new_var_name)
-    
-    elif refactoring_type == 'Add Method Annotation':
-        # Find a method to annotate
-        method_pattern = r'(public|private|protected).*?(\w+)\s*\([^)]*\)\s*\{'
-        matches = list(re.finditer(method_pattern, original_content))
-        
-        if not matches:
-            return False, "No methods found to annotate"
-        
-        match = matches[0]
-        method_name = match.group(2)
-        annotation = '@Override'  # Safe annotation
-        
-        return apply_proper_add_method_annotation(file_path, project_dir, method_name, annotation)
-    
-    elif refactoring_type == 'Change Return Type':
-        # Find a method with changeable return type
-        method_pattern = r'(public|private|protected).*?(String|int|boolean)\s+(\w+)\s*\([^)]*\)\s*\{'
-        matches = list(re.finditer(method_pattern, original_content))
-        
-        if not matches:
-            return False, "No methods with changeable return types found"
-        
-        match = matches[0]
-        old_type = match.group(2)
-        method_name = match.group(3)
-        
-        type_mappings = {'String': 'Object', 'int': 'long', 'boolean': 'Boolean'}
-        new_type = type_mappings.get(old_type, 'Object')
-        
-        return apply_proper_change_return_type(file_path, project_dir, method_name, old_type, new_type)
-    
-    elif refactoring_type == 'Move Class':
-        return apply_proper_move_class(file_path, project_dir)
-    
-    elif refactoring_type == 'Extract Method':
-        return apply_proper_extract_method(file_path, project_dir)
-    
-    elif refactoring_type == 'Change Attribute Type':
-        return apply_proper_change_attribute_type(file_path, project_dir)
-    
-    else:
+    transformation = _TRANSFORMATIONS.get(refactoring_type)
+    if transformation is None:
         return False, f"Refactoring type {refactoring_type} not implemented yet"
+    
+    return transformation(file_path, project_dir, original_content)
 
 def apply_proper_move_class(file_path, project_dir):
     """Move class by changing package and updating imports"""
@@ -307,7 +584,7 @@ def apply_proper_move_class(file_path, project_dir):
         return False, f"Could not read file: {e}"
     
     # Find current package
-    package_match = re.search(r'package\s+([^;]+);', content)
+    package_match = _PACKAGE_RE.search(content)
     if not package_match:
         return False, "No package declaration found"
     
@@ -326,14 +603,19 @@ def apply_proper_move_class(file_path, project_dir):
     
     # Write updated file
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(updated_content)
+        write_java_file(file_path, updated_content)
     except Exception as e:
         return False, f"Could not write file: {e}"
     
     # Find and update imports in other files
     class_name = os.path.basename(file_path).replace('.java', '')
-    java_files = find_all_java_files(project_dir)
+    # Only files mentioning the class name can import it
+    java_files = files_containing_token(project_dir, class_name)
+    
+    # Update import statements
+    old_import = f'import {old_package}.{class_name};'
+    new_import = f'import {new_package}.{class_name};'
+    old_import_bytes = old_import.encode()
     
     files_updated = 0
     for java_file in java_files:
@@ -341,20 +623,17 @@ def apply_proper_move_class(file_path, project_dir):
             continue
             
         try:
-            with open(java_file, 'r', encoding='utf-8') as f:
-                file_content = f.read()
-            
-            # Update import statements
-            old_import = f'import {old_package}.{class_name};'
-            new_import = f'import {new_package}.{class_name};'
+            # Only files that contain the import are decoded
+            with scan_buffer(java_file) as content:
+                if content.find(old_import_bytes) == -1:
+                    continue
+            file_content = read_java_file(java_file)
             
             if old_import in file_content:
                 updated_file_content = file_content.replace(old_import, new_import)
                 
-                with open(java_file, 'w', encoding='utf-8') as f:
-                    f.write(updated_file_content)
-                
-                files_updated += 1
+                if write_java_file(java_file, updated_file_content):
+                    files_updated += 1
         
         except Exception as e:
             print(f"Warning: Could not update imports in {java_file}: {e}")
@@ -370,6 +649,33 @@ def apply_proper_move_class(file_path, project_dir):
     
     return True, transformation
 
+def find_method_bodies(content):
+    """Yield (first_line, last_line) of each method body from one vectorised brace pass"""
+    buf = np.frombuffer(content.encode('utf-8'), dtype=np.uint8)
+    if len(buf) == 0:
+        return
+    
+    # Running brace depth, sampled at the end of every line
+    depth = np.cumsum((buf == ord('{')).astype(np.int32) - (buf == ord('}')))
+    line_depths = np.append(depth[buf == 10], depth[-1])
+    
+    signature_lines = []
+    line_num, pos = 0, 0
+    for match in _METHOD_SIGNATURE_LINE.finditer(content):
+        line_num += content.count('\n', pos, match.start())
+        pos = match.start()
+        signature_lines.append(line_num)
+    
+    for idx, start in enumerate(signature_lines):
+        depth_before = line_depths[start - 1] if start > 0 else 0
+        
+        # A nested signature restarts the search, so only look up to the next one
+        next_start = signature_lines[idx + 1] if idx + 1 < len(signature_lines) else len(line_depths) - 1
+        closing = np.flatnonzero(line_depths[start + 1:next_start + 1] == depth_before)
+        
+        if len(closing) and (idx + 1 == len(signature_lines) or start + 1 + closing[0] < next_start):
+            yield start, int(start + 1 + closing[0])
+
 def apply_proper_extract_method(file_path, project_dir):
     """Extract method with proper parameter handling"""
     
@@ -382,75 +688,62 @@ def apply_proper_extract_method(file_path, project_dir):
     lines = content.split('\n')
     
     # Find a method with multiple statements to extract from
-    in_method = False
-    method_start = -1
-    brace_count = 0
-    
-    for i, line in enumerate(lines):
-        if re.search(r'(public|private|protected).*\w+\s*\([^)]*\)\s*\{', line):
-            in_method = True
-            method_start = i
-            brace_count = line.count('{') - line.count('}')
-        elif in_method:
-            brace_count += line.count('{') - line.count('}')
-            if brace_count == 0:
-                # End of method found
-                method_lines = lines[method_start:i+1]
-                if len(method_lines) > 6:  # Method has enough lines
-                    # Extract middle portion (safer)
-                    extract_start = method_start + 2
-                    extract_end = min(method_start + 4, i-1)
-                    
-                    if extract_end > extract_start:
-                        # Create extracted method
-                        extracted_method_name = f"extracted{hash(str(method_lines)) % 10000}"
-                        extracted_lines = lines[extract_start:extract_end]
-                        
-                        # Simple parameter detection (look for local variables)
-                        params = []
-                        for line in extracted_lines:
-                            # Look for variable usage (very basic)
-                            var_matches = re.findall(r'\b([a-z][a-zA-Z0-9]*)\b', line)
-                            for var in var_matches[:1]:  # Take first variable as parameter
-                                if var not in ['if', 'for', 'while', 'return', 'new', 'this']:
-                                    params.append(f"Object {var}")
-                                    break
-                        
-                        # Create new method with parameters
-                        param_str = ', '.join(params[:2])  # Max 2 parameters
-                        indent = "    "
-                        new_method = [
-                            f"{indent}private void {extracted_method_name}({param_str}) {{",
-                            *[f"{indent}{line}" for line in extracted_lines],
-                            f"{indent}}}"
-                        ]
-                        
-                        # Replace extracted lines with method call
-                        call_params = ', '.join([p.split()[1] for p in params[:2]])
-                        lines[extract_start:extract_end] = [f"        {extracted_method_name}({call_params});"]
-                        
-                        # Insert new method after current method
-                        lines[i+1:i+1] = [""] + new_method
-                        
-                        updated_content = '\n'.join(lines)
-                        
-                        try:
-                            with open(file_path, 'w', encoding='utf-8') as f:
-                                f.write(updated_content)
-                        except Exception as e:
-                            return False, f"Could not write file: {e}"
-                        
-                        transformation = {
-                            'type': 'Extract Method (Proper)',
-                            'extracted_method': extracted_method_name,
-                            'parameters': params,
-                            'lines_extracted': len(extracted_lines),
-                            'location': f"Line {extract_start + 1}"
-                        }
-                        
-                        return True, transformation
+    for method_start, i in find_method_bodies(content):
+        method_lines = lines[method_start:i+1]
+        if len(method_lines) > 6:  # Method has enough lines
+            # Extract middle portion (safer)
+            extract_start = method_start + 2
+            extract_end = min(method_start + 4, i-1)
+            
+            if extract_end > extract_start:
+                # Create extracted method
+                # Content-addressed, so a rerun extracts under the same name (str hashes are salted per process)
+                digest = hashlib.blake2b('\n'.join(method_lines).encode('utf-8'), digest_size=4).hexdigest()
+                extracted_method_name = f"extracted{digest}"
+                extracted_lines = lines[extract_start:extract_end]
+                
+                # Simple parameter detection (look for local variables)
+                params = []
+                for line in extracted_lines:
+                    # Look for variable usage (very basic)
+                    var_matches = _LOWER_IDENTIFIER_RE.findall(line)
+                    for var in var_matches[:1]:  # Take first variable as parameter
+                        if var not in ['if', 'for', 'while', 'return', 'new', 'this']:
+                            params.append(f"Object {var}")
+                            break
+                
+                # Create new method with parameters
+                param_str = ', '.join(params[:2])  # Max 2 parameters
+                indent = "    "
+                new_method = [
+                    f"{indent}private void {extracted_method_name}({param_str}) {{",
+                    *[f"{indent}{line}" for line in extracted_lines],
+                    f"{indent}}}"
+                ]
+                
+                # Replace extracted lines with method call
+                call_params = ', '.join([p.split()[1] for p in params[:2]])
+                lines[extract_start:extract_end] = [f"        {extracted_method_name}({call_params});"]
+                
+                # Insert new method after current method
+                lines[i+1:i+1] = [""] + new_method
                 
-                in_method = False
+                updated_content = '\n'.join(lines)
+                
+                try:
+                    write_java_file(file_path, updated_content)
+                except Exception as e:
+                    return False, f"Could not write file: {e}"
+                
+                transformation = {
+                    'type': 'Extract Method (Proper)',
+                    'extracted_method': extracted_method_name,
+                    'parameters': params,
+                    'lines_extracted': len(extracted_lines),
+                    'location': f"Line {extract_start + 1}"
+                }
+                
+                return True, transformation
     
     return False, "No suitable method found for extraction"
 
@@ -464,9 +757,7 @@ def apply_proper_change_attribute_type(file_path, project_dir):
         return False, f"Could not read file: {e}"
     
     # Find field declarations
-    field_pattern = r'(\s*)(private|protected|public)(\s+)(static\s+)?(\w+)\s+(\w+)\s*[=;]'
-    
-    matches = list(re.finditer(field_pattern, content))
+    matches = list(_FIELD_DECL_RE.finditer(content))
     
     if not matches:
         return False, "No fields found to change type"
@@ -514,9 +805,11 @@ def apply_proper_change_attribute_type(file_path, project_dir):
     setter_replacement = lambda m: m.group(0).replace(old_type, new_type)
     updated_content = re.sub(setter_pattern, setter_replacement, updated_content)
     
+    if updated_content == content:
+        return False, "Attribute type change left the file unchanged"
+    
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(updated_content)
+        write_java_file(file_path, updated_content)
     except Exception as e:
         return False, f"Could not write file: {e}"
     
@@ -529,51 +822,147 @@ def apply_proper_change_attribute_type(file_path, project_dir):
     }
     
     return True, transformation
-    """Create backup of entire project"""
-    backup_dir = f"{project_dir}_backup"
+
+# Per-thread record of the files a refactoring rewrites, so they alone can be put back
+_journal_state = threading.local()
+
+def start_journal(project_dir):
+    """Begin recording the original of every file this thread rewrites"""
+    journal_dir = f"{project_dir}_journal"
+    if os.path.exists(journal_dir):
+        shutil.rmtree(journal_dir)
+    os.makedirs(journal_dir)
+    
+    _journal_state.journal = {'dir': journal_dir, 'files': {}}
+    return _journal_state.journal
+
+def restore_journal(journal):
+    """Put back every file recorded since start_journal and stop recording"""
+    _journal_state.journal = None
+    
+    for file_path, saved_path in journal['files'].items():
+        _evict_source(file_path)
+        if saved_path is None:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        else:
+            os.replace(saved_path, file_path)
+    
+    shutil.rmtree(journal['dir'], ignore_errors=True)
+
+def write_java_file(file_path, content):
+    """Write a source file by swapping in a new inode, leaving hardlinked snapshots intact"""
+    # A rewrite to identical text would only churn the inode and the journal
+    try:
+        if read_java_file(file_path) == content:
+            return False
+    except (OSError, UnicodeDecodeError):
+        pass
     
-    if os.path.exists(backup_dir):
-        import shutil
-        shutil.rmtree(backup_dir)
+    journal = getattr(_journal_state, 'journal', None)
+    if journal is not None and os.path.abspath(file_path) not in journal['files']:
+        # The original inode is parked in the journal (a link, not a copy) before the swap
+        saved_path = None
+        if os.path.exists(file_path):
+            saved_path = os.path.join(journal['dir'], str(len(journal['files'])))
+            try:
+                os.link(file_path, saved_path)
+            except OSError:
+                shutil.copy2(file_path, saved_path)
+        journal['files'][os.path.abspath(file_path)] = saved_path
+    
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, file_path)
+    _evict_source(file_path)
+    return True
+
+def discard_tree(path):
+    """Move a directory aside and delete it on a background thread"""
+    doomed = f"{path}.todelete.{uuid.uuid4().hex[:8]}"
+    
+    # Windows refuses the rename while a handle is still open; retry briefly
+    for attempt in range(5):
+        try:
+            os.rename(path, doomed)
+            break
+        except OSError:
+            if attempt == 4:
+                shutil.rmtree(path)
+                return
+            time.sleep(0.2)
+    
+    # Non-daemon so an interpreter exit waits for the delete instead of leaving it behind
+    threading.Thread(target=shutil.rmtree, args=(doomed,), kwargs={'ignore_errors': True}).start()
+
+def fast_copytree(source_dir, target_dir):
+    """Copy a directory tree with the platform's bulk copier, falling back to shutil"""
+    # Refactorings rewrite files in place, so hardlinks would leak edits back into
+    # the source tree; copy-on-write clones are safe and nearly free where supported
+    if sys.platform == 'win32':
+        cmd = ['robocopy', source_dir, target_dir, '/MT:64', '/E', '/NFL', '/NDL', '/NJH', '/NJS']
+    elif sys.platform == 'darwin':
+        cmd = ['cp', '-c', '-pR', source_dir, target_dir]
+    else:
+        cmd = ['cp', '-a', '--reflink=auto', source_dir, target_dir]
     
-    import shutil
-    shutil.copytree(project_dir, backup_dir)
+    try:
+        result = subprocess.run(cmd, capture_output=True)
+        # robocopy exit codes below 8 all mean success
+        if result.returncode == 0 or (sys.platform == 'win32' and result.returncode < 8):
+            return
+    except OSError:
+        pass
     
-    return backup_dir
+    if os.path.exists(target_dir):
+        shutil.rmtree(target_dir)
+    shutil.copytree(source_dir, target_dir)
 
-def restore_project(project_dir, backup_dir):
-    """Restore project from backup"""
-    if os.path.exists(project_dir):
-        import shutil
-        shutil.rmtree(project_dir)
+def _link_tree(source_dir, target_dir):
+    """Mirror a directory tree as hardlinks (metadata only, no file contents copied)"""
+    shutil.copytree(source_dir, target_dir, symlinks=True, copy_function=os.link)
+
+def snapshot_project(project_dir):
+    """Hardlink the pristine workspace once so every restore can relink it"""
+    snapshot_dir = f"{project_dir}_baseline"
     
-    import shutil
-    shutil.copytree(backup_dir, project_dir)
+    if os.path.exists(snapshot_dir):
+        shutil.rmtree(snapshot_dir)
     
-    # Clean up backup
-    shutil.rmtree(backup_dir)
+    _link_tree(project_dir, snapshot_dir)
+    
+    return snapshot_dir
 
 def backup_project(project_dir):
     """Create backup of entire project"""
+    # The baseline snapshot already is the backup - no per-call copy needed
+    snapshot_dir = f"{project_dir}_baseline"
+    if os.path.exists(snapshot_dir):
+        return snapshot_dir
+    
     backup_dir = f"{project_dir}_backup"
     
     if os.path.exists(backup_dir):
-        import shutil
         shutil.rmtree(backup_dir)
     
-    import shutil
-    shutil.copytree(project_dir, backup_dir)
+    fast_copytree(project_dir, backup_dir)
     
     return backup_dir
 
 def restore_project(project_dir, backup_dir):
     """Restore project from backup"""
+    forget_project(project_dir)
     if os.path.exists(project_dir):
-        import shutil
         shutil.rmtree(project_dir)
     
-    import shutil
-    shutil.copytree(backup_dir, project_dir)
+    if backup_dir == f"{project_dir}_baseline":
+        # Relinking costs one metadata write per file; the snapshot is kept for the
+        # next restore and stays pristine because edits go through write_java_file
+        _link_tree(backup_dir, project_dir)
+        return
+    
+    fast_copytree(backup_dir, project_dir)
     
     # Clean up backup
     shutil.rmtree(backup_dir)